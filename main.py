@@ -41,7 +41,8 @@
 #
 # SCHEMA MIGRATION (run once if posted field is missing):
 #   python main.py --migrate
-#   Adds posted/status/locked_at/posted_at/fail_reason fields.
+#   Adds posted/status/locked_at/posted_at/fail_reason fields
+#   and a unique index on link (enables insert-first soft lock).
 #
 # ONE-TIME CLEANUP (run once to clear unposted records):
 #   python main.py --cleanup
@@ -52,23 +53,41 @@
 # IMPORTS
 # ═══════════════════════════════════════════════════════════
 
+import io
 import os
+import sys
 import re
+import json
+import time
+import itertools
 import random
 import hashlib
 import asyncio
+import contextlib
 import warnings
 import feedparser
 import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from urllib.parse import urlparse
 from bs4 import BeautifulSoup
+from lxml import etree
 from telegram import Bot, InputMediaPhoto, LinkPreviewOptions
+from telegram.error import RetryAfter
+from telegram.request import HTTPXRequest
 from appwrite.client import Client
 from appwrite.services.databases import Databases
 from appwrite.exception import AppwriteException
 from appwrite.query import Query
+try:
+    from appwrite.encoders.value_class_encoder import (
+        ValueClassEncoder as _AppwriteJSONEncoder,
+    )
+except ImportError:   # older SDKs have no enum values to encode
+    _AppwriteJSONEncoder = json.JSONEncoder
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
@@ -85,12 +104,20 @@ ARTICLE_AGE_HOURS = 36
 MIN_CONTENT_CHARS = 150
 MAX_SCRAPED_CHARS = 3000
 MAX_RSS_CHARS     = 1000
+MAX_RSS_RAW_CHARS = 4 * MAX_RSS_CHARS   # raw summary HTML read per entry
+MAX_FEED_ENTRIES  = 40   # first N items read; assumes feeds list newest first
+FEED_STALE_STREAK = 5    # consecutive stale items that end a feed scan
 
 # ── Telegram ──
 CAPTION_MAX         = 1020
 MAX_IMAGES          = 10
+IMAGE_MAX_BYTES     = 5 * 1024 * 1024
 ALBUM_CAPTION_DELAY = 2.0
 STICKER_DELAY       = 1.5
+TG_POOL_SIZE        = 8
+TG_POOL_TIMEOUT     = 5.0
+TG_READ_TIMEOUT     = 30.0  # album uploads can take Telegram >5s to ack
+TG_RETRY_AFTER_MAX  = 15    # longer flood waits fail the send instead
 
 # ── Appwrite DB field size limits ──
 DB_LINK_MAX        = 999
@@ -101,9 +128,29 @@ DB_HASH_MAX        = 64
 DB_CATEGORY_MAX    = 49
 DB_DOMAIN_HASH_MAX = 64
 DB_REASON_MAX      = 499
+DB_DATETIME_FMT    = "%Y-%m-%dT%H:%M:%S.000+00:00"
+
+# ── HTTP ──
+HTTP_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+FEED_FETCH_CONCURRENCY = 20
+FEED_MAX_BYTES         = 1024 * 1024  # body cap; assumes newest items first
+FEED_CHUNK_BYTES       = 64 * 1024
+
+# Per-process feed cache:
+#   {feed_url: {etag, last_modified, candidates, fetched_at}}
+# Survives warm starts of the function container; empty on cold start.
+# Within FEED_CACHE_TTL seconds of the last fetch the feed is not
+# requested at all; after that a conditional GET revalidates it.
+FEED_CACHE_TTL = 300
+_FEED_CACHE: dict[str, dict] = {}
 
 # ── Timeouts ──
 FEED_FETCH_TIMEOUT = 7
+FEED_PARSE_TIMEOUT = 4   # parse-time budget per feed, from parse start
 FEEDS_SCAN_TIMEOUT = 22
 SCRAPE_TIMEOUT     = 12
 TELEGRAM_TIMEOUT   = 50
@@ -111,6 +158,18 @@ AI_PER_API_TIMEOUT = 20
 AI_RACE_TIMEOUT    = 35
 AI_TITLE_TIMEOUT   = 15
 AI_TIP_TIMEOUT     = 15
+IMAGE_DL_TIMEOUT   = 10
+
+# ── AI concurrency ──
+# Body, title and tip races run at once; cap in-flight requests per host.
+AI_MAX_CONCURRENCY_PER_PROVIDER = 3
+AI_KEEPALIVE_TIMEOUT            = 60
+
+# Per-process cache of race winners keyed by a digest of the prompt and
+# its max_tokens (the output cap shapes the answer), so a warm
+# run retrying the same article (after a failed post) reuses them.
+AI_RESULT_CACHE_MAX = 30
+_AI_RESULT_CACHE: dict[str, str] = {}
 
 # ── Persian validation ──
 MIN_PERSIAN_CHARS = 30
@@ -124,6 +183,8 @@ GROQ_MODELS = [
 ]
 GROQ_MAX_TOKENS  = 700
 GROQ_TEMPERATURE = 0.4
+GROQ_MODELS_URL  = "https://api.groq.com/openai/v1/models"
+GROQ_CHAT_URL    = "https://api.groq.com/openai/v1/chat/completions"
 
 # ── OpenRouter (FIX 3) ──
 # Free model tried first, paid model as fallback.
@@ -133,12 +194,27 @@ OPENROUTER_MODELS = [
 ]
 OPENROUTER_MAX_TOKENS  = 700
 OPENROUTER_TEMPERATURE = 0.4
+OPENROUTER_MODELS_URL  = "https://openrouter.ai/api/v1/models"
+OPENROUTER_CHAT_URL    = "https://openrouter.ai/api/v1/chat/completions"
+
+# ── Per-race output caps (body uses the provider defaults above) ──
+AI_TITLE_MAX_TOKENS = 150
+AI_TIP_MAX_TOKENS   = 300
 
 # ── Lock / dedup ──
 LOCK_TTL_SECONDS           = 600
 FUZZY_SIMILARITY_THRESHOLD = 0.65
 FUZZY_LOOKBACK_COUNT       = 150
+LINK_LOOKBACK_COUNT        = 500
+DEDUP_BATCH_SIZE           = 100   # Appwrite caps Query.equal at 100 values
+DEDUP_BATCH_LIMIT          = 1000
 DOMAIN_DEDUP_HOURS         = 6
+SEEN_LINKS_MAX             = 5000
+
+# Per-process set of links confirmed posted, oldest first.
+# Like _FEED_CACHE it survives warm starts only; a hit skips the
+# Appwrite link lookup, a miss still goes to the batch query.
+_SEEN_LINKS: dict[str, None] = {}
 
 # ── Article state values ──
 STATUS_LOCKED = "locked"
@@ -257,6 +333,12 @@ HASHTAG_MAP = {
 }
 MAX_HASHTAGS = 5
 
+CATEGORY_EMOJI = {
+    "runway": "👗", "brand": "🏷️", "business": "📊",
+    "beauty": "💄", "sustainability": "♻️", "celebrity": "⭐",
+    "trend": "🔥", "general": "🌐",
+}
+
 FASHION_STICKERS = [
     "CAACAgIAAxkBAAIBmGRx1yRFMVhVqVXLv_dAAXJMOdFNAAIUAAOVgnkAAVGGBbBjxbg4LwQ",
     "CAACAgIAAxkBAAIBmWRx1yRqy9JkN2DmV_Z2sRsKdaTjAAIVAAOVgnkAAc8R3q5p5-AELAQ",
@@ -297,6 +379,7 @@ BOILERPLATE_PATTERNS = [
 ]
 
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+_IMAGE_EXT_TUPLE = tuple(IMAGE_EXTENSIONS)   # str.endswith needs a tuple
 IMAGE_BLOCKLIST  = [
     "doubleclick", "googletagmanager", "googlesyndication",
     "facebook.com/tr", "analytics", "pixel", "beacon",
@@ -313,6 +396,36 @@ TITLE_STOP_WORDS = {
     "after", "new", "first", "last", "says", "said",
 }
 
+# ── Precompiled patterns (hot loops: per entry / per element) ──
+_HTML_TAG_RE      = re.compile(r"<[^>]+>")
+_WHITESPACE_RE    = re.compile(r"\s+")
+_NON_ALNUM_RE     = re.compile(r"[^a-z0-9\s]")
+_IMG_SRC_RE       = re.compile(
+    r"""<img\b[^>]*?\ssrc\s*=\s*["']([^"']+)["']""", re.I,
+)
+_ARTICLE_BODY_RE  = re.compile(r"article[-_]?body",  re.I)
+_POST_CONTENT_RE  = re.compile(r"post[-_]?content",  re.I)
+_ENTRY_CONTENT_RE = re.compile(r"entry[-_]?content", re.I)
+_STORY_BODY_RE    = re.compile(r"story[-_]?body",    re.I)
+
+# _is_valid_persian: Arabic-script ranges and provider error markers
+_PERSIAN_CHAR_RE  = re.compile("[\u0600-\u06ff\ufb50-\ufdff\ufe70-\ufeff]")
+_AI_ERROR_MARKERS = (
+    "error", "invalid_api_key", "rate_limit", "quota_exceeded",
+    "model_not_found", "context_length_exceeded", "bad request",
+    "unauthorized", "forbidden", "too many requests",
+    "service unavailable", "internal server error",
+    "user not found",
+)
+
+# Feed item elements for the lxml fast path (RSS 2.0, RSS 1.0, Atom)
+_MEDIA_NS       = "http://search.yahoo.com/mrss/"
+_FEED_ITEM_TAGS = (
+    "item",
+    "{http://purl.org/rss/1.0/}item",
+    "{http://www.w3.org/2005/Atom}entry",
+)
+
 
 # ═══════════════════════════════════════════════════════════
 # SECTION 2 — AI PROMPT TEMPLATES
@@ -389,6 +502,8 @@ class SchemaInfo:
         self.has_content_hash = False  # content_hash field exists
         self.has_title_hash   = False  # title_hash field exists
         self.has_domain_hash  = False  # domain_hash field exists
+        self.has_unique_link  = False  # unique index on link exists
+        self.probe_errors     = 0      # transient probe failures
 
     @property
     def is_v11(self) -> bool:
@@ -406,7 +521,8 @@ class SchemaInfo:
             f"status={self.has_status}, "
             f"locked_at={self.has_locked_at}, "
             f"content_hash={self.has_content_hash}, "
-            f"title_hash={self.has_title_hash})"
+            f"title_hash={self.has_title_hash}, "
+            f"unique_link={self.has_unique_link})"
         )
 
 
@@ -439,8 +555,11 @@ def _detect_schema(
             if "attribute not found" in msg:
                 return False
             # Other error = field probably exists, DB issue
+            if e.code == 429 or (e.code or 0) >= 500:
+                info.probe_errors += 1
             return True
         except Exception:
+            info.probe_errors += 1
             return False
 
     info.has_posted       = _probe("posted",       True)
@@ -451,6 +570,12 @@ def _detect_schema(
     info.has_content_hash = _probe("content_hash", "x")
     info.has_title_hash   = _probe("title_hash",   "x")
     info.has_domain_hash  = _probe("domain_hash",  "x")
+    unique_link = _has_unique_link_index(
+        databases, database_id, collection_id, log_fn,
+    )
+    if unique_link is None:
+        info.probe_errors += 1
+    info.has_unique_link  = bool(unique_link)
 
     log_fn(f"[schema] Detected: {info}")
     if not info.is_v11:
@@ -462,10 +587,178 @@ def _detect_schema(
     return info
 
 
+def _has_unique_link_index(
+    databases,
+    database_id: str,
+    collection_id: str,
+    log_fn=print,
+) -> bool | None:
+    """
+    True if an available unique index covers exactly [link].
+    Needs the indexes.read scope on the API key; without it the
+    lock keeps the lookup-first path. None on a transient error.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            r = databases.list_indexes(
+                database_id=database_id,
+                collection_id=collection_id,
+            )
+    except AppwriteException as e:
+        if e.code == 429 or (e.code or 0) >= 500:
+            return None
+        log_fn(
+            f"[schema] list_indexes denied ({e.code}) — grant indexes.read "
+            f"for insert-first locking."
+        )
+        return False
+    except Exception:
+        return None
+    return any(
+        str(ix.get("type", "")).endswith("unique")
+        and ix.get("attributes") == ["link"]
+        and ix.get("status", "available") == "available"
+        for ix in r.get("indexes", [])
+    )
+
+
 # ═══════════════════════════════════════════════════════════
 # SECTION 4 — DB WRAPPER (FIX 4 — deprecation)
 # ═══════════════════════════════════════════════════════════
 
+_DATABASES_CACHE: dict[tuple[str, str, str], Databases] = {}
+_SCHEMA_CACHE: dict[tuple[str, str, str, str], SchemaInfo] = {}
+APPWRITE_POOL_SIZE = 10   # >= default-executor threads issuing DB calls
+
+
+class _PooledClient(Client):
+    """
+    Appwrite Client that sends JSON calls over its own keep-alive
+    requests.Session. The stock call() uses the module-level
+    requests.request(), which opens a new TCP+TLS connection per call.
+    Multipart calls (file uploads) fall through to the stock call(),
+    as does every call on an SDK whose Client lacks the internals
+    used here (_SDK_INTERNALS); behaviour was checked on 24.3.1.
+
+    The session is shared by the default-executor threads that run
+    the _db_* wrappers. That is safe here: every call is an
+    independent request, nothing mutates session state (no cookies,
+    auth or headers on the session), and urllib3's pool is
+    thread-safe, sized by APPWRITE_POOL_SIZE.
+    """
+
+    _SDK_INTERNALS = ("_global_headers", "_endpoint", "_self_signed", "flatten")
+
+    def __init__(self):
+        super().__init__()
+        self._pooled  = all(hasattr(self, a) for a in self._SDK_INTERNALS)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=2, pool_maxsize=APPWRITE_POOL_SIZE,
+        )
+        self._session.mount("https://", adapter)
+        self._session.mount("http://",  adapter)
+
+    def call(self, method, path="", headers=None, params=None,
+             response_type="json"):
+        if not self._pooled:
+            return super().call(method, path, headers, params, response_type)
+        merged = {**self._global_headers, **(headers or {})}
+        if not merged.get("content-type", "").startswith("application/json"):
+            return super().call(method, path, headers, params, response_type)
+
+        params = params or {}
+        data   = None
+        if method != "get":
+            data   = json.dumps(params, cls=_AppwriteJSONEncoder)
+            params = {}
+
+        response = None
+        try:
+            response = self._session.request(
+                method=method,
+                url=self._endpoint + path,
+                params=self.flatten(params),
+                data=data,
+                headers=merged,
+                verify=not self._self_signed,
+                allow_redirects=response_type != "location",
+            )
+            response.raise_for_status()
+            sdk_warnings = response.headers.get("x-appwrite-warning")
+            if sdk_warnings:
+                for warning in sdk_warnings.split(";"):
+                    print(f"Warning: {warning}", file=sys.stderr)
+            if response_type == "location":
+                return response.headers.get("Location")
+            if response.headers.get("Content-Type", "").startswith(
+                "application/json"
+            ):
+                return response.json()
+            return response.content
+        except Exception as e:
+            if response is None:
+                raise AppwriteException(e)
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            if not isinstance(body, dict):
+                raise AppwriteException(
+                    response.text, response.status_code, None, response.text,
+                )
+            raise AppwriteException(
+                body.get("message"), response.status_code,
+                body.get("type"), response.text,
+            )
+
+
+def _get_databases(endpoint: str, project: str, api_key: str) -> Databases:
+    """
+    Appwrite Databases service, built once per (endpoint, project, key).
+    Warm invocations reuse the same Client, and every DB call goes
+    over its pooled keep-alive session.
+    """
+    key = (endpoint, project, api_key)
+    if key not in _DATABASES_CACHE:
+        aw_client = _PooledClient()
+        aw_client.set_endpoint(endpoint)
+        aw_client.set_project(project)
+        aw_client.set_key(api_key)
+        _DATABASES_CACHE[key] = Databases(aw_client)
+    return _DATABASES_CACHE[key]
+
+
+def _get_schema(
+    databases,
+    endpoint: str,
+    project: str,
+    database_id: str,
+    collection_id: str,
+    sdk_mode: str,
+    log_fn=print,
+) -> SchemaInfo:
+    """
+    _detect_schema once per (endpoint, project, database, collection).
+    Warm invocations skip the probes and the index lookup. A result
+    with transient probe errors is not cached. A warm container keeps
+    the pre-migration schema until it is recycled, so redeploy the
+    function after --migrate.
+    """
+    key    = (endpoint, project, database_id, collection_id)
+    cached = _SCHEMA_CACHE.get(key)
+    if cached is not None:
+        log_fn(f"[schema] Cached: {cached}")
+        return cached
+    info = _detect_schema(
+        databases, database_id, collection_id, sdk_mode, log_fn,
+    )
+    if not info.probe_errors:
+        _SCHEMA_CACHE[key] = info
+    return info
+
+
 def _db_list(
     databases,
     database_id: str,
@@ -590,22 +883,10 @@ def _is_valid_persian(text: str | None) -> bool:
     stripped = text.strip()
     if len(stripped) < MIN_PERSIAN_CHARS:
         return False
-    has_persian = any(
-        "\u0600" <= ch <= "\u06ff"
-        or "\ufb50" <= ch <= "\ufdff"
-        or "\ufe70" <= ch <= "\ufeff"
-        for ch in stripped
-    )
-    if not has_persian:
+    if not _PERSIAN_CHAR_RE.search(stripped):
         return False
-    _ERROR_MARKERS = (
-        "error", "invalid_api_key", "rate_limit", "quota_exceeded",
-        "model_not_found", "context_length_exceeded", "bad request",
-        "unauthorized", "forbidden", "too many requests",
-        "service unavailable", "internal server error",
-        "user not found",
-    )
-    if any(m in stripped.lower() for m in _ERROR_MARKERS):
+    lowered = stripped.lower()
+    if any(m in lowered for m in _AI_ERROR_MARKERS):
         return False
     return True
 
@@ -625,46 +906,64 @@ def _extract_openai_content(data: dict) -> str | None:
 # SECTION 6 — AI PROVIDER VALIDATION (FIX 2 & 3)
 # ═══════════════════════════════════════════════════════════
 
-async def _validate_groq_key(log_fn=print) -> bool:
-    """Quick probe to verify Groq key is valid."""
+async def _validate_groq_key(
+    log_fn=print,
+    session: aiohttp.ClientSession | None = None,
+) -> bool:
+    """
+    Quick probe to verify Groq key is valid.
+    Given the run's AI session, the probe also leaves a warm
+    connection behind for the races.
+    """
     api_key = os.environ.get("GROQ_API_KEY", "").strip()
     if not api_key:
         return False
+    if session is None:
+        async with _ai_session() as own_session:
+            return await _validate_groq_key(log_fn, own_session)
     try:
-        connector = aiohttp.TCPConnector(ssl=False)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            async with session.get(
-                "https://api.groq.com/openai/v1/models",
-                headers={"Authorization": f"Bearer {api_key}"},
-                timeout=aiohttp.ClientTimeout(total=5),
-            ) as resp:
-                valid = resp.status == 200
-                log_fn(f"[startup] Groq key valid={valid} (HTTP {resp.status})")
-                return valid
+        async with session.get(
+            GROQ_MODELS_URL,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=aiohttp.ClientTimeout(total=5),
+        ) as resp:
+            await resp.read()  # drain so the connection is pooled, not closed
+            valid = resp.status == 200
+            log_fn(f"[startup] Groq key valid={valid} (HTTP {resp.status})")
+            return valid
     except Exception as e:
         log_fn(f"[startup] Groq key probe failed: {e}")
         return False
 
 
-async def _validate_openrouter_key(log_fn=print) -> bool:
-    """Quick probe to verify OpenRouter key is valid."""
+async def _validate_openrouter_key(
+    log_fn=print,
+    session: aiohttp.ClientSession | None = None,
+) -> bool:
+    """
+    Quick probe to verify OpenRouter key is valid.
+    Given the run's AI session, the probe also leaves a warm
+    connection behind for the races.
+    """
     api_key = os.environ.get("OPENROUTER_API_KEY", "").strip()
     if not api_key:
         return False
+    if session is None:
+        async with _ai_session() as own_session:
+            return await _validate_openrouter_key(log_fn, own_session)
     try:
-        connector = aiohttp.TCPConnector(ssl=False)
-        async with aiohttp.ClientSession(connector=connector) as session:
-            async with session.get(
-                "https://openrouter.ai/api/v1/models",
-                headers={"Authorization": f"Bearer {api_key}"},
-                timeout=aiohttp.ClientTimeout(total=5),
-            ) as resp:
-                valid = resp.status == 200
-                log_fn(
-                    f"[startup] OpenRouter key valid={valid} "
-                    f"(HTTP {resp.status})"
-                )
-                return valid
+        async with session.get(
+            OPENROUTER_MODELS_URL,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=aiohttp.ClientTimeout(total=5),
+        ) as resp:
+            await resp.read()  # drain so the connection is pooled, not closed
+            valid = resp.status == 200
+            log_fn(
+                f"[startup] OpenRouter key valid={valid} "
+                f"(HTTP {resp.status})"
+            )
+            return valid
     except Exception as e:
         log_fn(f"[startup] OpenRouter key probe failed: {e}")
         return False
@@ -678,6 +977,7 @@ async def _call_groq(
     session: aiohttp.ClientSession,
     prompt: str,
     log_fn=print,
+    max_tokens: int | None = None,
 ) -> str | None:
     """
     Groq API caller with model fallback chain.
@@ -699,11 +999,11 @@ async def _call_groq(
             "model":       model,
             "messages":    [{"role": "user", "content": prompt}],
             "temperature": GROQ_TEMPERATURE,
-            "max_tokens":  GROQ_MAX_TOKENS,
+            "max_tokens":  max_tokens or GROQ_MAX_TOKENS,
         }
         try:
             async with session.post(
-                "https://api.groq.com/openai/v1/chat/completions",
+                GROQ_CHAT_URL,
                 json=payload,
                 headers=headers,
                 timeout=aiohttp.ClientTimeout(total=AI_PER_API_TIMEOUT),
@@ -731,8 +1031,7 @@ async def _call_groq(
                     )
                     continue
 
-                import json as _json
-                data   = _json.loads(body_text)
+                data   = json.loads(body_text)
                 result = _extract_openai_content(data)
                 valid  = _is_valid_persian(result)
                 log_fn(
@@ -762,6 +1061,7 @@ async def _call_openrouter(
     session: aiohttp.ClientSession,
     prompt: str,
     log_fn=print,
+    max_tokens: int | None = None,
 ) -> str | None:
     """
     OpenRouter API caller with model fallback chain.
@@ -785,11 +1085,11 @@ async def _call_openrouter(
             "model":       model,
             "messages":    [{"role": "user", "content": prompt}],
             "temperature": OPENROUTER_TEMPERATURE,
-            "max_tokens":  OPENROUTER_MAX_TOKENS,
+            "max_tokens":  max_tokens or OPENROUTER_MAX_TOKENS,
         }
         try:
             async with session.post(
-                "https://openrouter.ai/api/v1/chat/completions",
+                OPENROUTER_CHAT_URL,
                 json=payload,
                 headers=headers,
                 timeout=aiohttp.ClientTimeout(total=AI_PER_API_TIMEOUT),
@@ -819,8 +1119,7 @@ async def _call_openrouter(
                     )
                     continue
 
-                import json as _json
-                data   = _json.loads(body_text)
+                data   = json.loads(body_text)
                 result = _extract_openai_content(data)
                 valid  = _is_valid_persian(result)
                 log_fn(
@@ -852,16 +1151,34 @@ async def _parallel_ai_race(
     prompt: str,
     race_timeout: int = AI_RACE_TIMEOUT,
     log_fn=print,
+    session: aiohttp.ClientSession | None = None,
+    max_tokens: int | None = None,
 ) -> str | None:
     """
     First-response-wins parallel AI race.
     Groq and OpenRouter fire simultaneously.
     Each internally tries its model chain.
     Returns first valid Persian response.
+    Reuses the caller's session when given, else opens its own.
+    Winners are cached per (prompt, max_tokens) for later warm runs.
     """
     if not prompt or not prompt.strip():
         return None
 
+    cache_key = hashlib.blake2b(
+        f"{max_tokens}\0{prompt}".encode(), digest_size=16,
+    ).hexdigest()
+    cached    = _AI_RESULT_CACHE.get(cache_key)
+    if cached is not None:
+        log_fn(f"[race] ✓ Cached result: {len(cached)}ch.")
+        return cached
+
+    if session is None:
+        async with _ai_session() as own_session:
+            return await _parallel_ai_race(
+                prompt, race_timeout, log_fn, own_session, max_tokens,
+            )
+
     result_queue: asyncio.Queue[str | None] = asyncio.Queue()
 
     providers = [
@@ -872,7 +1189,7 @@ async def _parallel_ai_race(
 
     async def _worker(name: str, caller_fn, session: aiohttp.ClientSession):
         try:
-            result = await caller_fn(session, prompt, log_fn)
+            result = await caller_fn(session, prompt, log_fn, max_tokens)
             await result_queue.put(result)
         except asyncio.CancelledError:
             raise
@@ -880,67 +1197,105 @@ async def _parallel_ai_race(
             log_fn(f"[race] _worker({name}) unhandled: {e}")
             await result_queue.put(None)
 
-    connector = aiohttp.TCPConnector(limit=10, enable_cleanup_closed=True)
-    async with aiohttp.ClientSession(connector=connector) as session:
-
-        tasks: list[asyncio.Task] = [
-            asyncio.create_task(
-                _worker(name, fn, session),
-                name=f"race_{name.lower()}",
-            )
-            for name, fn in providers
-        ]
-
-        log_fn(
-            f"[race] ★ {total} providers fired "
-            f"(timeout={race_timeout}s)."
+    tasks: list[asyncio.Task] = [
+        asyncio.create_task(
+            _worker(name, fn, session),
+            name=f"race_{name.lower()}",
         )
+        for name, fn in providers
+    ]
 
-        winner:     str | None = None
-        none_count: int        = 0
-
-        try:
-            async with asyncio.timeout(race_timeout):
-                while none_count < total:
-                    result = await result_queue.get()
-                    if _is_valid_persian(result):
-                        winner = result
-                        log_fn(
-                            f"[race] ✓ Winner: {len(winner)}ch."
-                        )
-                        break
-                    else:
-                        none_count += 1
-                        log_fn(
-                            f"[race] ✗ Invalid "
-                            f"({none_count}/{total})."
-                        )
-        except TimeoutError:
-            log_fn(f"[race] ✗ Timed out after {race_timeout}s.")
+    log_fn(
+        f"[race] ★ {total} providers fired "
+        f"(timeout={race_timeout}s)."
+    )
 
-        finally:
-            for t in tasks:
-                if not t.done():
-                    t.cancel()
-            await asyncio.gather(*tasks, return_exceptions=True)
+    winner:     str | None = None
+    none_count: int        = 0
 
+    try:
+        async with asyncio.timeout(race_timeout):
+            while none_count < total:
+                result = await result_queue.get()
+                if _is_valid_persian(result):
+                    winner = result
+                    log_fn(
+                        f"[race] ✓ Winner: {len(winner)}ch."
+                    )
+                    break
+                else:
+                    none_count += 1
+                    log_fn(
+                        f"[race] ✗ Invalid "
+                        f"({none_count}/{total})."
+                    )
+    except TimeoutError:
+        log_fn(f"[race] ✗ Timed out after {race_timeout}s.")
+
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if winner is not None:
+        _AI_RESULT_CACHE[cache_key] = winner
+        while len(_AI_RESULT_CACHE) > AI_RESULT_CACHE_MAX:
+            del _AI_RESULT_CACHE[next(iter(_AI_RESULT_CACHE))]
     return winner
 
 
+def _ai_session() -> aiohttp.ClientSession:
+    """
+    Shared session for AI races. limit_per_host bounds how many
+    requests hit one provider at once (free-tier RPM safety).
+    keepalive_timeout keeps the startup probe's connection open
+    through the feed scan and scrape.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=10,
+        limit_per_host=AI_MAX_CONCURRENCY_PER_PROVIDER,
+        keepalive_timeout=AI_KEEPALIVE_TIMEOUT,
+        enable_cleanup_closed=True,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
 async def _run_three_races(
     body_prompt: str,
     title_prompt: str,
     tip_prompt: str,
     log_fn=print,
+    title_task: asyncio.Task | None = None,
+    session: aiohttp.ClientSession | None = None,
 ) -> tuple[str | None, str | None, str | None]:
-    """Run body + title + tip races concurrently."""
+    """
+    Run body + title + tip races concurrently over one session,
+    so model-fallback retries reuse warm provider connections.
+    A title race already started by the caller is awaited instead.
+    """
+    if session is None:
+        async with _ai_session() as own_session:
+            return await _run_three_races(
+                body_prompt, title_prompt, tip_prompt,
+                log_fn, title_task, own_session,
+            )
+
     log_fn("[ai] Starting 3 concurrent AI races...")
     try:
         results = await asyncio.wait_for(
             asyncio.gather(
-                _parallel_ai_race(body_prompt,  AI_RACE_TIMEOUT,  log_fn),
-                _parallel_ai_race(title_prompt, AI_TITLE_TIMEOUT, log_fn),
-                _parallel_ai_race(tip_prompt,   AI_TIP_TIMEOUT,   log_fn),
+                _parallel_ai_race(
+                    body_prompt,  AI_RACE_TIMEOUT,  log_fn, session,
+                ),
+                title_task or _parallel_ai_race(
+                    title_prompt, AI_TITLE_TIMEOUT, log_fn, session,
+                    AI_TITLE_MAX_TOKENS,
+                ),
+                _parallel_ai_race(
+                    tip_prompt,   AI_TIP_TIMEOUT,   log_fn, session,
+                    AI_TIP_MAX_TOKENS,
+                ),
                 return_exceptions=True,
             ),
             timeout=AI_RACE_TIMEOUT + 10,
@@ -965,6 +1320,15 @@ async def _run_three_races(
 # SECTION 8 — CAPTION BUILDER
 # ═══════════════════════════════════════════════════════════
 
+_CAPTION_SEP  = "─────────────\nمد و فشن ایرانی"
+_HTML_ESC_MAP = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+def _html_escape(text: str) -> str:
+    """Escape for Telegram HTML parse mode in one translate pass."""
+    return text.translate(_HTML_ESC_MAP)
+
+
 def _build_mehrjameh_caption(
     title_fa: str,
     body_fa: str,
@@ -987,24 +1351,12 @@ def _build_mehrjameh_caption(
 
       #hashtags
     """
-    def _esc(t: str) -> str:
-        return (
-            t.replace("&", "&amp;")
-             .replace("<", "&lt;")
-             .replace(">", "&gt;")
-        )
-
-    CATEGORY_EMOJI = {
-        "runway": "👗", "brand": "🏷️", "business": "📊",
-        "beauty": "💄", "sustainability": "♻️", "celebrity": "⭐",
-        "trend": "🔥", "general": "🌐",
-    }
     emoji     = CATEGORY_EMOJI.get(category, "🌐")
     hash_line = " ".join(hashtags)
 
-    header    = f"<b>{_esc(title_fa.strip())}</b>"
-    sep       = "─────────────\nمد و فشن ایرانی"
-    tip_block = f"💡 {_esc(tip_fa.strip())}" if tip_fa and tip_fa.strip() else ""
+    header    = f"<b>{_html_escape(title_fa.strip())}</b>"
+    sep       = _CAPTION_SEP
+    tip_block = f"💡 {_html_escape(tip_fa.strip())}" if tip_fa and tip_fa.strip() else ""
     footer    = f"{emoji}  <i>کانال مد و فشن ایرانی</i>"
 
     # Calculate body budget
@@ -1019,10 +1371,10 @@ def _build_mehrjameh_caption(
     fixed_len   = sum(len(p) for p in fixed_parts) + separators
     body_budget = CAPTION_MAX - fixed_len - 4
 
-    safe_body = _esc(body_fa.strip())
+    safe_body = _html_escape(body_fa.strip())
     if body_budget <= 10:
         safe_body = ""
-        header    = f"<b>{_esc(title_fa.strip())[:80]}</b>"
+        header    = f"<b>{_html_escape(title_fa.strip())[:80]}</b>"
     elif len(safe_body) > body_budget:
         safe_body = safe_body[:body_budget - 1] + "…"
 
@@ -1046,6 +1398,24 @@ def _build_mehrjameh_caption(
 # ═══════════════════════════════════════════════════════════
 
 async def main(event=None, context=None):
+    # One AI session per run: the startup key probes open the
+    # provider connections that the races reuse later.
+    async with _ai_session() as ai_session:
+        return await _run(event, context, ai_session)
+
+
+async def _cancel_and_wait(*tasks) -> None:
+    """Cancel unfinished tasks, then wait for all of them to unwind."""
+    for task in tasks:
+        if task is not None and not task.done():
+            task.cancel()
+    for task in tasks:
+        if task is not None:
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await task
+
+
+async def _run(event, context, ai_session: aiohttp.ClientSession):
     log   = context.log   if context and hasattr(context, "log")   else print
     error = context.error if context and hasattr(context, "error") else print
 
@@ -1081,12 +1451,10 @@ async def main(event=None, context=None):
         return {"status": "error", "missing_vars": missing}
 
     # ── Clients ──
-    bot       = Bot(token=token)
-    aw_client = Client()
-    aw_client.set_endpoint(appwrite_endpoint)
-    aw_client.set_project(appwrite_project)
-    aw_client.set_key(appwrite_key)
-    databases = Databases(aw_client)
+    bot       = await _get_bot(token)
+    databases = _get_databases(
+        appwrite_endpoint, appwrite_project, appwrite_key,
+    )
     sdk_mode  = "new" if hasattr(databases, "list_rows") else "legacy"
     log(f"SDK mode: {sdk_mode}")
 
@@ -1095,11 +1463,12 @@ async def main(event=None, context=None):
 
     schema, groq_ok, or_ok = await asyncio.gather(
         loop.run_in_executor(
-            None, _detect_schema,
-            databases, database_id, COLLECTION_ID, sdk_mode, log,
+            None, _get_schema,
+            databases, appwrite_endpoint, appwrite_project,
+            database_id, COLLECTION_ID, sdk_mode, log,
         ),
-        _validate_groq_key(log),
-        _validate_openrouter_key(log),
+        _validate_groq_key(log, ai_session),
+        _validate_openrouter_key(log, ai_session),
     )
 
     log(
@@ -1127,12 +1496,25 @@ async def main(event=None, context=None):
         f"Peak={'YES' if is_peak else 'no'}"
     )
 
-    # Load posted-only titles for fuzzy dedup
-    recent_titles = _load_recent_titles_posted_only(
-        databases, database_id, COLLECTION_ID,
-        sdk_mode, FUZZY_LOOKBACK_COUNT, schema, log,
+    # Posted-only titles (fuzzy dedup) and links (pre-filter) load
+    # side by side; the Appwrite SDK is blocking, so both go to the
+    # executor.
+    recent_titles, recent_links = await asyncio.gather(
+        loop.run_in_executor(
+            None, _load_recent_titles_posted_only,
+            databases, database_id, COLLECTION_ID,
+            sdk_mode, FUZZY_LOOKBACK_COUNT, schema, log,
+        ),
+        loop.run_in_executor(
+            None, _load_recent_links,
+            databases, database_id, COLLECTION_ID,
+            sdk_mode, LINK_LOOKBACK_COUNT, schema, log,
+        ),
+    )
+    log(
+        f"[{elapsed()}s] {len(recent_titles)} posted titles, "
+        f"{len(recent_links)} posted links loaded."
     )
-    log(f"[{elapsed()}s] {len(recent_titles)} posted titles loaded.")
 
     # ════════════════════════════════
     # PHASE 1 — RSS SCAN
@@ -1150,6 +1532,7 @@ async def main(event=None, context=None):
                 schema=schema,
                 now=now,
                 recent_titles=recent_titles,
+                recent_links=recent_links,
                 is_peak=is_peak,
                 log_fn=log,
             ),
@@ -1181,61 +1564,89 @@ async def main(event=None, context=None):
         f"score={score} cat={category} | {title[:65]}"
     )
 
-    # ════════════════════════════════
-    # PHASE 2 — LIGHT DEDUP
-    # ════════════════════════════════
-    log(f"[{elapsed()}s] Phase 2: Light dedup...")
-    is_dup, dup_reason = _light_duplicate_check(
-        databases, database_id, COLLECTION_ID,
-        link, content_hash, title_hash, sdk_mode, schema, log,
+    # The title race needs only the RSS title, so it starts now and
+    # overlaps dedup + scrape; body and tip wait for the scraped text.
+    title_prompt = _PROMPT_TITLE.format(input_text=title[:500])
+    title_task   = asyncio.create_task(
+        _parallel_ai_race(
+            title_prompt, AI_TITLE_TIMEOUT, log, ai_session,
+            AI_TITLE_MAX_TOKENS,
+        ),
+        name="race_title_early",
     )
-    if is_dup:
-        log(f"[{elapsed()}s] Confirmed dup ({dup_reason}). Skip.")
-        return {"status": "success", "posted": False, "reason": dup_reason}
 
-    # ════════════════════════════════
-    # PHASE 3 — PARALLEL SCRAPE
-    # ════════════════════════════════
-    log(f"[{elapsed()}s] Phase 3: Scraping...")
+    # Both early tasks are cancelled and awaited on every exit from
+    # phases 2-4, so none outlives the run or its AI session.
+    scrape_task: asyncio.Future | None = None
     try:
-        text_result, image_result = await asyncio.wait_for(
-            asyncio.gather(
-                loop.run_in_executor(None, _scrape_text, link, log),
-                loop.run_in_executor(None, _scrape_images, link, entry, log),
-                return_exceptions=True,
-            ),
-            timeout=SCRAPE_TIMEOUT,
+        # ════════════════════════════════
+        # PHASE 2 — LIGHT DEDUP
+        # The scrape starts speculatively while the dedup query is in
+        # flight and is cancelled if the article turns out to be a dup.
+        # ════════════════════════════════
+        log(f"[{elapsed()}s] Phase 2: Light dedup...")
+        scrape_task = asyncio.ensure_future(
+            asyncio.wait_for(
+                loop.run_in_executor(None, _scrape_article, link, entry, log),
+                timeout=SCRAPE_TIMEOUT,
+            )
         )
-    except asyncio.TimeoutError:
-        error(f"[{elapsed()}s] Scrape timed out.")
-        text_result  = None
-        image_result = []
+        is_dup, dup_reason = await loop.run_in_executor(
+            None, _light_duplicate_check,
+            databases, database_id, COLLECTION_ID,
+            link, content_hash, title_hash, sdk_mode, schema, log,
+        )
+        if is_dup:
+            log(f"[{elapsed()}s] Confirmed dup ({dup_reason}). Skip.")
+            return {"status": "success", "posted": False, "reason": dup_reason}
+
+        # ════════════════════════════════
+        # PHASE 3 — SCRAPE
+        # ════════════════════════════════
+        log(f"[{elapsed()}s] Phase 3: Scraping...")
+        try:
+            text_result, image_result = await scrape_task
+        except asyncio.TimeoutError:
+            error(f"[{elapsed()}s] Scrape timed out.")
+            text_result  = None
+            image_result = []
 
-    full_text  = text_result  if isinstance(text_result,  str)  else None
-    image_urls = image_result if isinstance(image_result, list) else []
-    content    = _select_content(full_text, desc, title)
+        full_text  = text_result  if isinstance(text_result,  str)  else None
+        image_urls = image_result if isinstance(image_result, list) else []
+        content    = _select_content(full_text, desc, title)
 
-    log(
-        f"[{elapsed()}s] "
-        f"Text={'scraped' if full_text else 'fallback'} "
-        f"({len(content)}ch) | Images={len(image_urls)}"
-    )
-
-    if len(content) < MIN_CONTENT_CHARS:
-        error(f"[{elapsed()}s] Thin content ({len(content)}ch).")
-        return {"status": "skipped", "reason": "thin_content", "posted": False}
+        log(
+            f"[{elapsed()}s] "
+            f"Text={'scraped' if full_text else 'fallback'} "
+            f"({len(content)}ch) | Images={len(image_urls)}"
+        )
 
-    # ════════════════════════════════
-    # PHASE 4 — PARALLEL AI RACES
-    # ════════════════════════════════
-    log(f"[{elapsed()}s] Phase 4: AI races (body + title + tip)...")
-    body_prompt  = _PROMPT_BODY.format(input_text=content[:3000])
-    title_prompt = _PROMPT_TITLE.format(input_text=title[:500])
-    tip_prompt   = _PROMPT_TIP.format(input_text=content[:1500])
+        if len(content) < MIN_CONTENT_CHARS:
+            error(f"[{elapsed()}s] Thin content ({len(content)}ch).")
+            return {"status": "skipped", "reason": "thin_content", "posted": False}
 
-    body_fa, title_fa, tip_fa = await _run_three_races(
-        body_prompt, title_prompt, tip_prompt, log_fn=log,
-    )
+        # ════════════════════════════════
+        # PHASE 4 — PARALLEL AI RACES
+        # ════════════════════════════════
+        log(
+            f"[{elapsed()}s] Phase 4: AI races (body + title + tip) "
+            f"+ image prefetch..."
+        )
+        body_prompt  = _PROMPT_BODY.format(input_text=content[:3000])
+        tip_prompt   = _PROMPT_TIP.format(input_text=content[:1500])
+
+        # Image bytes download while the AI races run
+        (body_fa, title_fa, tip_fa), image_media = await asyncio.gather(
+            _run_three_races(
+                body_prompt, title_prompt, tip_prompt, log_fn=log,
+                title_task=title_task, session=ai_session,
+            ),
+            _download_images(image_urls, log),
+        )
+    finally:
+        # A cancelled scrape only drops the wait_for wrapper: its
+        # executor thread still runs to completion in the background.
+        await _cancel_and_wait(title_task, scrape_task)
 
     title_fa = (title_fa or "").strip() or title
     body_fa  = (body_fa  or "").strip() or None
@@ -1270,24 +1681,26 @@ async def main(event=None, context=None):
     # PHASE 6 — SOFT LOCK WRITE
     # ════════════════════════════════
     log(f"[{elapsed()}s] Phase 6: Soft lock...")
-    lock_acquired, lock_result = _write_soft_lock(
-        databases=databases,
-        database_id=database_id,
-        collection_id=COLLECTION_ID,
-        link=link,
-        title=title,
-        feed_url=feed_url,
-        pub_date=pub_date,
-        source_type=SOURCE_TYPE,
-        sdk_mode=sdk_mode,
-        schema=schema,
-        title_hash=title_hash,
-        content_hash=content_hash,
-        category=category,
-        trend_score=score,
-        post_hour=current_hour,
-        domain_hash=domain_hash,
-        log_fn=log,
+    lock_acquired, lock_result = await loop.run_in_executor(
+        None, lambda: _write_soft_lock(
+            databases=databases,
+            database_id=database_id,
+            collection_id=COLLECTION_ID,
+            link=link,
+            title=title,
+            feed_url=feed_url,
+            pub_date=pub_date,
+            source_type=SOURCE_TYPE,
+            sdk_mode=sdk_mode,
+            schema=schema,
+            title_hash=title_hash,
+            content_hash=content_hash,
+            category=category,
+            trend_score=score,
+            post_hour=current_hour,
+            domain_hash=domain_hash,
+            log_fn=log,
+        ),
     )
 
     if not lock_acquired:
@@ -1305,7 +1718,7 @@ async def main(event=None, context=None):
     post_error = ""
     try:
         posted = await asyncio.wait_for(
-            _post_to_telegram(bot, chat_id, caption, image_urls, log),
+            _post_to_telegram(bot, chat_id, caption, image_media, log),
             timeout=TELEGRAM_TIMEOUT,
         )
     except asyncio.TimeoutError:
@@ -1317,20 +1730,30 @@ async def main(event=None, context=None):
 
     # ════════════════════════════════
     # PHASE 8 — UPDATE DB STATE
+    # Sticker goes out while the DB write is in flight.
     # ════════════════════════════════
+    sticker_task = (
+        asyncio.create_task(_send_sticker(bot, chat_id, log))
+        if posted else None
+    )
+    if posted:
+        _remember_links([link[:DB_LINK_MAX]])
     if schema.is_v11:
         if posted:
-            _mark_posted(
+            await loop.run_in_executor(
+                None, _mark_posted,
                 databases, database_id, COLLECTION_ID,
                 doc_id, sdk_mode, log,
             )
             log(f"[{elapsed()}s] DB → posted=true ✓")
         else:
-            _mark_failed(
-                databases, database_id, COLLECTION_ID,
-                doc_id, sdk_mode,
-                reason=post_error or "telegram_failed",
-                log_fn=log,
+            await loop.run_in_executor(
+                None, lambda: _mark_failed(
+                    databases, database_id, COLLECTION_ID,
+                    doc_id, sdk_mode,
+                    reason=post_error or "telegram_failed",
+                    log_fn=log,
+                ),
             )
             error(f"[{elapsed()}s] DB → status=failed")
     else:
@@ -1338,6 +1761,8 @@ async def main(event=None, context=None):
             f"[{elapsed()}s] Schema missing v11 fields — "
             f"skipping status update. Run --migrate."
         )
+    if sticker_task is not None:
+        await sticker_task
 
     result = {
         "images":     image_urls,
@@ -1362,26 +1787,30 @@ async def main(event=None, context=None):
 async def _find_best_candidate(
     feeds, databases, database_id, collection_id,
     time_threshold, sdk_mode, schema, now,
-    recent_titles, is_peak, log_fn=print,
+    recent_titles, is_peak, recent_links=frozenset(), log_fn=print,
 ):
-    loop  = asyncio.get_running_loop()
-    tasks = [
-        loop.run_in_executor(
-            None, _fetch_feed, url, time_threshold, log_fn
-        )
-        for url in feeds
-    ]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
+    all_candidates = await _collect_feed_candidates(
+        feeds, time_threshold, log_fn,
+    )
+    log_fn(f"[feed] {len(all_candidates)} articles collected.")
 
-    all_candidates = []
-    for i, result in enumerate(results):
-        if isinstance(result, Exception):
-            log_fn(f"[feed] Error ({feeds[i][:45]}): {result}")
+    # Drop known-posted and repeated links before any scoring or DB work
+    collected  = len(all_candidates)
+    seen_links = set(recent_links)
+    seen_links.update(_SEEN_LINKS)
+    unique     = []
+    for c in all_candidates:
+        key = c["link"][:DB_LINK_MAX]
+        if key in seen_links:
             continue
-        if result:
-            all_candidates.extend(result)
-
-    log_fn(f"[feed] {len(all_candidates)} articles collected.")
+        seen_links.add(key)
+        unique.append(c)
+    all_candidates = unique
+    if len(all_candidates) < collected:
+        log_fn(
+            f"[feed] {collected - len(all_candidates)} already posted "
+            f"or repeated — {len(all_candidates)} left."
+        )
     if not all_candidates:
         return None
 
@@ -1398,46 +1827,73 @@ async def _find_best_candidate(
             f"{c['title'][:58]}"
         )
 
-    recent_domain_hashes = _load_recent_domain_hashes(
-        databases, database_id, collection_id, sdk_mode, schema, log_fn
-    )
     seen_domains: set[str] = set()
 
+    for c in all_candidates:
+        c["content_hash"] = _make_content_hash(c["title"])
+        c["title_hash"]   = _make_title_hash(c["title"], c["feed_url"])
+
+    # One batched query per field instead of one query per candidate,
+    # and the batches run side by side with the domain-hash load.
+    # None = batch failed → fall back to per-candidate queries below.
+    loop = asyncio.get_running_loop()
+
+    def _batch(field: str, values: list) -> asyncio.Future:
+        return loop.run_in_executor(
+            None, _query_field_batch,
+            databases, database_id, collection_id, field,
+            values, sdk_mode, schema, log_fn,
+        )
+
+    async def _no_hits() -> set:
+        return set()
+
+    (
+        recent_domain_hashes, link_hits, content_hits, title_hits,
+    ) = await asyncio.gather(
+        loop.run_in_executor(
+            None, _load_recent_domain_hashes,
+            databases, database_id, collection_id, sdk_mode, schema, log_fn,
+        ),
+        _batch("link", [c["link"][:DB_LINK_MAX] for c in all_candidates]),
+        _batch("content_hash", [c["content_hash"] for c in all_candidates])
+        if schema.has_content_hash else _no_hits(),
+        _batch("title_hash", [c["title_hash"] for c in all_candidates])
+        if schema.has_title_hash else _no_hits(),
+    )
+
+    _remember_links(link_hits or ())
+
+    def _is_dup(field: str, value: str, hits: set | None) -> bool:
+        if hits is not None:
+            return value in hits
+        return _query_field_safe(
+            databases, database_id, collection_id,
+            field, value, sdk_mode, schema, log_fn,
+        ) is True
+
     for c in all_candidates:
         link         = c["link"]
         title        = c["title"]
-        feed_url     = c["feed_url"]
         domain       = _get_domain(link)
-        content_hash = _make_content_hash(title)
-        title_hash   = _make_title_hash(title, feed_url)
+        content_hash = c["content_hash"]
+        title_hash   = c["title_hash"]
         domain_hash  = _make_domain_hash(domain)
 
-        # L1: Exact URL
-        r = _query_field_safe(
-            databases, database_id, collection_id,
-            "link", link[:DB_LINK_MAX], sdk_mode, schema, log_fn,
-        )
-        if r is True:
+        # L1: Exact URL (preloaded posted links were filtered above)
+        if _is_dup("link", link[:DB_LINK_MAX], link_hits):
             log_fn(f"[SKIP] L1: {title[:58]}")
             continue
 
         # L2: Content hash (if field exists)
         if schema.has_content_hash:
-            r = _query_field_safe(
-                databases, database_id, collection_id,
-                "content_hash", content_hash, sdk_mode, schema, log_fn,
-            )
-            if r is True:
+            if _is_dup("content_hash", content_hash, content_hits):
                 log_fn(f"[SKIP] L2: {title[:58]}")
                 continue
 
         # L2b: Title hash (if field exists)
         if schema.has_title_hash:
-            r = _query_field_safe(
-                databases, database_id, collection_id,
-                "title_hash", title_hash, sdk_mode, schema, log_fn,
-            )
-            if r is True:
+            if _is_dup("title_hash", title_hash, title_hits):
                 log_fn(f"[SKIP] L2b: {title[:58]}")
                 continue
 
@@ -1469,47 +1925,351 @@ async def _find_best_candidate(
     return None
 
 
-def _fetch_feed(
+async def _collect_feed_candidates(
+    feeds: list,
+    time_threshold: datetime,
+    log_fn=print,
+) -> list:
+    """
+    Fetch and parse all feeds concurrently over one aiohttp session.
+    Each feed is parsed in the executor as soon as its own body
+    arrives, so parsing overlaps the slower downloads instead of
+    waiting for the last one. Failed feeds are logged and skipped.
+    """
+    loop   = asyncio.get_running_loop()
+    cached = 0
+
+    async def _one(session: aiohttp.ClientSession, url: str) -> list:
+        nonlocal cached
+        body, headers = await _fetch_feed(session, url)
+        if body is None:
+            # Fresh cache hit or 304 — reuse the entries parsed last time
+            cached += 1
+            return _feed_cache_candidates(url, time_threshold)
+        # _parse_feed enforces FEED_PARSE_TIMEOUT itself, timed from
+        # when the worker picks it up, so time queued behind other
+        # feeds never counts against it. If FEEDS_SCAN_TIMEOUT cancels
+        # the scan, this await is dropped but the parse thread keeps
+        # running to completion in the background.
+        result = await loop.run_in_executor(
+            None, _parse_feed,
+            url, body, headers.get("content-type", ""),
+            time_threshold, log_fn,
+        )
+        _feed_cache_store(url, headers, result)
+        return result
+
+    connector = aiohttp.TCPConnector(
+        limit=FEED_FETCH_CONCURRENCY, enable_cleanup_closed=True,
+    )
+    async with aiohttp.ClientSession(
+        connector=connector,
+        headers={"User-Agent": HTTP_USER_AGENT},
+    ) as session:
+        results = await asyncio.gather(
+            *(_one(session, url) for url in feeds),
+            return_exceptions=True,
+        )
+
+    candidates = []
+    for url, result in zip(feeds, results):
+        if isinstance(result, Exception):
+            log_fn(
+                f"[feed] Error ({url[:45]}): "
+                f"{type(result).__name__}: {result}"
+            )
+            continue
+        candidates.extend(result)
+
+    if cached:
+        log_fn(f"[feed] {cached} feeds served from cache (TTL/304).")
+    return candidates
+
+
+async def _fetch_feed(
+    session: aiohttp.ClientSession,
+    url: str,
+) -> tuple[bytes | None, dict]:
+    """
+    GET one feed. Feeds fetched within FEED_CACHE_TTL are not
+    requested; others send If-None-Match / If-Modified-Since from
+    the feed cache. Cache hits and 304s return body=None.
+    A 304 with nothing cached (sent by a proxy or server although no
+    validators went out) is retried once as a no-cache GET.
+    The body is read only up to FEED_MAX_BYTES.
+    Headers are returned with lower-cased names.
+    """
+    if _feed_cache_is_fresh(url):
+        return None, {}
+    attempts = (_feed_cache_validators(url), {"Cache-Control": "no-cache"})
+    for request_headers in attempts:
+        async with session.get(
+            url,
+            headers=request_headers,
+            timeout=aiohttp.ClientTimeout(total=FEED_FETCH_TIMEOUT),
+        ) as resp:
+            if resp.status == 304:
+                cached = _FEED_CACHE.get(url)
+                if cached is None:
+                    continue
+                cached["fetched_at"] = time.monotonic()
+                return None, {}
+            resp.raise_for_status()
+            headers = {
+                name.lower(): resp.headers[name]
+                for name in ("Content-Type", "ETag", "Last-Modified")
+                if name in resp.headers
+            }
+            body = bytearray()
+            async for chunk in resp.content.iter_chunked(FEED_CHUNK_BYTES):
+                body += chunk
+                if len(body) >= FEED_MAX_BYTES:
+                    break
+            return bytes(body), headers
+    raise ValueError("304 Not Modified with no cached copy")
+
+
+def _feed_cache_validators(feed_url: str) -> dict:
+    """Conditional-GET headers for a feed seen earlier in this process."""
+    cached  = _FEED_CACHE.get(feed_url)
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+def _feed_cache_is_fresh(feed_url: str) -> bool:
+    cached = _FEED_CACHE.get(feed_url)
+    return bool(cached) and (
+        time.monotonic() - cached["fetched_at"] < FEED_CACHE_TTL
+    )
+
+
+def _feed_cache_store(feed_url: str, headers: dict, candidates: list) -> None:
+    """Remember validators + parsed candidates for the next warm run."""
+    _FEED_CACHE[feed_url] = {
+        "etag":          headers.get("etag", ""),
+        "last_modified": headers.get("last-modified", ""),
+        "candidates":    candidates,
+        "fetched_at":    time.monotonic(),
+    }
+
+
+def _feed_cache_candidates(feed_url: str, time_threshold: datetime) -> list:
+    """Cached candidates for a 304 feed, re-filtered by the new threshold."""
+    cached = _FEED_CACHE.get(feed_url) or {}
+    return [
+        dict(c) for c in cached.get("candidates", [])
+        if c["pub_date"] >= time_threshold
+    ]
+
+
+def _parse_feed(
     feed_url: str,
+    body: bytes,
+    content_type: str,
     time_threshold: datetime,
     log_fn=print,
 ) -> list:
-    import socket
+    # Well-formed feeds take the lxml fast path; anything it cannot
+    # read (bad XML, undefined entities, odd dates) goes to feedparser.
+    # The parse budget starts here, in the worker thread.
+    deadline = time.monotonic() + FEED_PARSE_TIMEOUT
+    fast     = _parse_feed_fast(feed_url, body, time_threshold, deadline)
+    if fast is not None:
+        return fast
+    if time.monotonic() >= deadline:
+        log_fn(f"[feed] Parse budget spent ({feed_url[:45]}) — skipped.")
+        return []
+
+    # feedparser.parse is one uninterruptible call; its input is
+    # bounded by FEED_MAX_BYTES rather than by the deadline.
+    # Hand feedparser the real Content-Type so it takes the declared
+    # charset instead of sniffing encodings over the raw bytes.
+    # Its sanitizer and URI resolver are skipped: summaries are
+    # tag-stripped here and caption text is escaped before sending.
+    response_headers = {"content-type": content_type} if content_type else None
     try:
-        old = socket.getdefaulttimeout()
-        socket.setdefaulttimeout(FEED_FETCH_TIMEOUT)
-        feed = feedparser.parse(feed_url)
-        socket.setdefaulttimeout(old)
+        feed = feedparser.parse(
+            body,
+            response_headers=response_headers,
+            sanitize_html=False,
+            resolve_relative_uris=False,
+        )
     except Exception as e:
         log_fn(f"[feed] feedparser error ({feed_url[:45]}): {e}")
         return []
 
-    candidates = []
-    for entry in feed.entries:
+    # published_parsed is a UTC struct_time, so its first six fields
+    # compare directly against the threshold's; only entries that
+    # pass get a datetime. Feeds are assumed to list newest first but
+    # RSS does not guarantee it, so stale entries are skipped and only
+    # FEED_STALE_STREAK of them in a row end the scan.
+    threshold_tuple = time_threshold.utctimetuple()[:6]
+    candidates      = []
+    stale_streak    = 0
+    for entry in itertools.islice(feed.entries, MAX_FEED_ENTRIES):
         published = (
             entry.get("published_parsed") or entry.get("updated_parsed")
         )
         if not published:
             continue
-        pub_date = datetime(*published[:6], tzinfo=timezone.utc)
-        if pub_date < time_threshold:
-            continue
-        title = (entry.get("title") or "").strip()
-        link  = (entry.get("link")  or "").strip()
-        if not title or not link:
+        if published[:6] < threshold_tuple:
+            stale_streak += 1
+            if stale_streak >= FEED_STALE_STREAK:
+                break
             continue
-        raw  = entry.get("summary") or entry.get("description") or ""
-        desc = re.sub(r"<[^>]+>", " ", raw)
-        desc = re.sub(r"\s+",     " ", desc).strip()
-        candidates.append({
-            "title": title, "link": link,
-            "description": desc, "feed_url": feed_url,
-            "pub_date": pub_date, "entry": entry,
-            "score": 0, "category": "general",
-        })
+        stale_streak = 0
+        pub_date  = datetime(*published[:6], tzinfo=timezone.utc)
+        candidate = _feed_candidate(feed_url, entry, pub_date)
+        if candidate:
+            candidates.append(candidate)
+    return candidates
+
+
+def _parse_feed_fast(
+    feed_url: str,
+    body: bytes,
+    time_threshold: datetime,
+    deadline: float | None = None,
+) -> list | None:
+    """
+    Streaming lxml parse of RSS 2.0 / RSS 1.0 / Atom items.
+    Reads only the fields the bot uses and frees each item once read.
+    Stale items are skipped; the scan stops after FEED_STALE_STREAK
+    stale items in a row (feeds are assumed, not guaranteed, to list
+    newest first) or after MAX_FEED_ENTRIES items.
+    A body cut at FEED_MAX_BYTES keeps the items read before the cut;
+    past the monotonic deadline the items read so far are returned.
+    Returns None when feedparser should handle the feed instead.
+    """
+    candidates   = []
+    stale_streak = 0
+    try:
+        items = etree.iterparse(
+            io.BytesIO(body), events=("end",), tag=_FEED_ITEM_TAGS,
+            resolve_entities=False, no_network=True,
+        )
+        for _, item in itertools.islice(items, MAX_FEED_ENTRIES):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            entry = _feed_item_entry(item)
+            item.clear()
+            while item.getprevious() is not None:
+                del item.getparent()[0]
+
+            raw_date = entry.get("published") or entry.get("updated")
+            if not raw_date:
+                continue
+            pub_date = _parse_feed_date(raw_date)
+            if pub_date < time_threshold:
+                stale_streak += 1
+                if stale_streak >= FEED_STALE_STREAK:
+                    break
+                continue
+            stale_streak = 0
+            candidate = _feed_candidate(feed_url, entry, pub_date)
+            if candidate:
+                candidates.append(candidate)
+    except (etree.LxmlError, ValueError, TypeError):
+        if candidates and len(body) >= FEED_MAX_BYTES:
+            return candidates
+        return None
     return candidates
 
 
+def _feed_item_entry(item) -> feedparser.FeedParserDict:
+    """Map one <item>/<entry> element to the feedparser entry keys we read."""
+    entry           = feedparser.FeedParserDict()
+    media_content   = []
+    media_thumbnail = []
+    for child in item.iter():
+        if child is item or not isinstance(child.tag, str):
+            continue
+        qname = etree.QName(child)
+        ns, name = qname.namespace, qname.localname
+        if ns == _MEDIA_NS:
+            if name == "content":
+                media_content.append(dict(child.attrib))
+            elif name == "thumbnail":
+                media_thumbnail.append(dict(child.attrib))
+            continue
+        if child.getparent() is not item:
+            continue
+        text = (child.text or "").strip()
+        if name == "title":
+            entry.setdefault("title", text)
+        elif name == "link":
+            href = child.get("href")
+            rel  = child.get("rel", "alternate")
+            if href is None:
+                entry.setdefault("link", text)
+            elif rel == "alternate":
+                entry.setdefault("link", href)
+            elif rel == "enclosure":
+                entry.setdefault("links", []).append({
+                    "rel":  rel,
+                    "href": href,
+                    "type": child.get("type", ""),
+                })
+        elif name in ("description", "summary"):
+            entry.setdefault("summary", text)
+        elif name in ("encoded", "content"):
+            entry.setdefault("content", [{"value": text}])
+        elif name == "enclosure":
+            # FeedParserDict derives "enclosures" from rel=enclosure links
+            entry.setdefault("links", []).append({
+                "rel":  "enclosure",
+                "href": child.get("url", ""),
+                "type": child.get("type", ""),
+            })
+        elif name in ("pubDate", "published", "date", "issued"):
+            entry.setdefault("published", text)
+        elif name in ("updated", "modified"):
+            entry.setdefault("updated", text)
+    if media_content:
+        entry["media_content"] = media_content
+    if media_thumbnail:
+        entry["media_thumbnail"] = media_thumbnail
+    return entry
+
+
+def _parse_feed_date(text: str) -> datetime:
+    """RFC 822 (RSS) or ISO 8601 (Atom / dc:date), as aware UTC."""
+    try:
+        dt = parsedate_to_datetime(text)
+    except (TypeError, ValueError):
+        dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _feed_candidate(feed_url: str, entry, pub_date: datetime) -> dict | None:
+    title = (entry.get("title") or "").strip()
+    link  = (entry.get("link")  or "").strip()
+    if not title or not link:
+        return None
+    # Some feeds ship the whole article HTML as the summary; scoring
+    # and the RSS fallback need only its head, so cut before the regex
+    # passes and drop any tag the cut left open.
+    raw = entry.get("summary") or entry.get("description") or ""
+    if len(raw) > MAX_RSS_RAW_CHARS:
+        raw = raw[:MAX_RSS_RAW_CHARS]
+        if raw.rfind("<") > raw.rfind(">"):
+            raw = raw[:raw.rfind("<")]
+    desc = _HTML_TAG_RE.sub(" ", raw)
+    desc = _WHITESPACE_RE.sub(" ", desc).strip()
+    return {
+        "title": title, "link": link,
+        "description": desc, "feed_url": feed_url,
+        "pub_date": pub_date, "entry": entry,
+        "score": 0, "category": "general",
+    }
+
+
 def _score_article(
     candidate: dict, now: datetime, is_peak: bool = False
 ) -> int:
@@ -1565,11 +2325,9 @@ def _detect_category(title: str, description: str) -> str:
 def _extract_hashtags_from_text(text: str) -> list[str]:
     lower    = text.lower()
     hashtags = []
-    seen: set[str] = set()
     for keyword, tags in HASHTAG_MAP.items():
-        if keyword in lower and keyword not in seen:
+        if keyword in lower:
             hashtags.append(tags)
-            seen.add(keyword)
             if len(hashtags) >= MAX_HASHTAGS:
                 break
     return hashtags
@@ -1625,6 +2383,62 @@ def _query_field_safe(
         return None
 
 
+def _query_field_batch(
+    databases,
+    database_id: str,
+    collection_id: str,
+    field: str,
+    values: list,
+    sdk_mode: str,
+    schema: SchemaInfo,
+    log_fn=print,
+) -> set | None:
+    """
+    Batched _query_field_safe: one Query.equal(field, [...]) per
+    DEDUP_BATCH_SIZE values instead of one query per value.
+    Same posted=true filtering rules as _query_field_safe.
+
+    Returns the subset of values found in the collection,
+    or None on DB error / truncated page (caller falls back
+    to per-value queries).
+    """
+    values = list(dict.fromkeys(v for v in values if v))
+    found: set = set()
+    for i in range(0, len(values), DEDUP_BATCH_SIZE):
+        chunk   = values[i:i + DEDUP_BATCH_SIZE]
+        queries = [Query.equal(field, chunk), Query.limit(DEDUP_BATCH_LIMIT)]
+        if schema.has_posted:
+            queries.insert(1, Query.equal("posted", True))
+        try:
+            r = _db_list(databases, database_id, collection_id, queries, sdk_mode)
+        except AppwriteException as e:
+            msg = str(e.message).lower()
+            if "attribute not found" in msg:
+                log_fn(f"[dedup] Field '{field}' not in schema — treating as safe.")
+                return set()
+            log_fn(f"[dedup] _query_field_batch ({field}): {e.message}")
+            return None
+        except Exception as e:
+            log_fn(f"[dedup] _query_field_batch ({field}): {e}")
+            return None
+        docs = r.get("documents", r.get("rows", []))
+        if r.get("total", 0) > len(docs):
+            log_fn(f"[dedup] _query_field_batch ({field}): page truncated.")
+            return None
+        found.update(d[field] for d in docs if d.get(field))
+    log_fn(f"[dedup] Batch {field}: {len(found)}/{len(values)} found.")
+    return found
+
+
+def _remember_links(links) -> None:
+    """Add confirmed-posted links to _SEEN_LINKS, evicting the oldest."""
+    for link in links:
+        _SEEN_LINKS.pop(link, None)
+        _SEEN_LINKS[link] = None
+    while len(_SEEN_LINKS) > SEEN_LINKS_MAX:
+        del _SEEN_LINKS[next(iter(_SEEN_LINKS))]
+
+
 def _light_duplicate_check(
     databases,
     database_id: str,
@@ -1707,6 +2521,37 @@ def _load_recent_titles_posted_only(
         return []
 
 
+def _load_recent_links(
+    databases,
+    database_id: str,
+    collection_id: str,
+    sdk_mode: str,
+    limit: int,
+    schema: SchemaInfo,
+    log_fn=print,
+) -> set:
+    """
+    Load the most recent links as an in-memory set.
+    A hit is a confirmed duplicate and needs no DB round-trip;
+    a miss still falls through to the authoritative link query.
+    v11 schema: posted=true only.
+    Legacy schema: all recent records (no posted filter).
+    """
+    try:
+        queries = [
+            Query.limit(limit),
+            Query.order_desc("$createdAt"),
+        ]
+        if schema.has_posted:
+            queries.insert(0, Query.equal("posted", True))
+        r    = _db_list(databases, database_id, collection_id, queries, sdk_mode)
+        docs = r.get("documents", r.get("rows", []))
+        return {d["link"] for d in docs if d.get("link")}
+    except Exception as e:
+        log_fn(f"[dedup] _load_recent_links: {e}")
+        return set()
+
+
 def _load_recent_domain_hashes(
     databases,
     database_id: str,
@@ -1716,7 +2561,7 @@ def _load_recent_domain_hashes(
     log_fn=print,
 ) -> set:
     cutoff     = datetime.now(timezone.utc) - timedelta(hours=DOMAIN_DEDUP_HOURS)
-    cutoff_str = cutoff.strftime("%Y-%m-%dT%H:%M:%S.000+00:00")
+    cutoff_str = cutoff.strftime(DB_DATETIME_FMT)
     try:
         queries = [
             Query.greater_than("$createdAt", cutoff_str),
@@ -1747,9 +2592,57 @@ def _write_soft_lock(
     """
     Acquire distributed soft lock.
     Adapts payload based on schema fields available.
+
+    With a unique index on link (schema.has_unique_link) the insert
+    is tried first: the common no-record case costs one round-trip.
+    Only a conflict triggers the lookup + stale-lock recovery below.
     """
+    # One clock read: locked_at and the stale-lock age use the same now
     now     = datetime.now(timezone.utc)
-    now_iso = now.strftime("%Y-%m-%dT%H:%M:%S.000+00:00")
+    now_iso = now.strftime(DB_DATETIME_FMT)
+
+    if pub_date.tzinfo is None:
+        pub_date = pub_date.replace(tzinfo=timezone.utc)
+
+    # Build payload — only include fields that exist in schema
+    payload: dict = {
+        "link":        link[:DB_LINK_MAX],
+        "title":       title[:DB_TITLE_MAX],
+        "published_at": pub_date.strftime(DB_DATETIME_FMT),
+        "feed_url":    feed_url[:DB_FEED_URL_MAX],
+        "source_type": source_type[:DB_SOURCE_TYPE_MAX],
+        "category":    category[:DB_CATEGORY_MAX],
+        "trend_score": int(trend_score),
+        "post_hour":   int(post_hour),
+    }
+
+    if schema.has_content_hash:
+        payload["content_hash"] = content_hash[:DB_HASH_MAX]
+    if schema.has_title_hash:
+        payload["title_hash"] = title_hash[:DB_HASH_MAX]
+    if schema.has_domain_hash:
+        payload["domain_hash"] = domain_hash[:DB_DOMAIN_HASH_MAX]
+
+    # v11 state fields
+    if schema.has_status:
+        payload["status"] = STATUS_LOCKED
+    if schema.has_posted:
+        payload["posted"] = False
+    if schema.has_locked_at:
+        payload["locked_at"] = now_iso
+    if schema.has_posted_at:
+        payload["posted_at"] = ""
+    if schema.has_fail_reason:
+        payload["fail_reason"] = ""
+
+    if schema.has_unique_link:
+        acquired, result = _create_lock_record(
+            databases, database_id, collection_id, payload, sdk_mode, log_fn,
+            insert_first=True,
+        )
+        if acquired or result != "race_lost":
+            return acquired, result
+        log_fn("[lock] Link already recorded — inspecting existing.")
 
     existing = _get_existing_record(
         databases, database_id, collection_id, link, sdk_mode, log_fn
@@ -1771,21 +2664,18 @@ def _write_soft_lock(
                     locked_at_str.replace("Z", "+00:00")
                 )
                 age = (now - locked_at).total_seconds()
-                if age < LOCK_TTL_SECONDS:
-                    log_fn(f"[lock] Active lock (age={age:.0f}s). Skip.")
-                    return False, "active_lock"
-                else:
-                    log_fn(f"[lock] Stale lock (age={age:.0f}s). Recovering.")
-                    _delete_record(
-                        databases, database_id, collection_id,
-                        existing_doc_id, sdk_mode, log_fn,
-                    )
-            except Exception as e:
+            except (ValueError, TypeError) as e:
                 log_fn(f"[lock] TTL parse: {e}. Deleting stale.")
-                _delete_record(
-                    databases, database_id, collection_id,
-                    existing_doc_id, sdk_mode, log_fn,
-                )
+                age = None
+            if age is not None and age < LOCK_TTL_SECONDS:
+                log_fn(f"[lock] Active lock (age={age:.0f}s). Skip.")
+                return False, "active_lock"
+            if age is not None:
+                log_fn(f"[lock] Stale lock (age={age:.0f}s). Recovering.")
+            _delete_record(
+                databases, database_id, collection_id,
+                existing_doc_id, sdk_mode, log_fn,
+            )
         elif existing_status == STATUS_FAILED:
             log_fn("[lock] Failed → retry. Deleting old.")
             _delete_record(
@@ -1799,40 +2689,22 @@ def _write_soft_lock(
                 existing_doc_id, sdk_mode, log_fn,
             )
 
-    if pub_date.tzinfo is None:
-        pub_date = pub_date.replace(tzinfo=timezone.utc)
-
-    # Build payload — only include fields that exist in schema
-    payload: dict = {
-        "link":        link[:DB_LINK_MAX],
-        "title":       title[:DB_TITLE_MAX],
-        "published_at": pub_date.strftime("%Y-%m-%dT%H:%M:%S.000+00:00"),
-        "feed_url":    feed_url[:DB_FEED_URL_MAX],
-        "source_type": source_type[:DB_SOURCE_TYPE_MAX],
-        "category":    category[:DB_CATEGORY_MAX],
-        "trend_score": int(trend_score),
-        "post_hour":   int(post_hour),
-    }
-
-    if schema.has_content_hash:
-        payload["content_hash"] = content_hash[:DB_HASH_MAX]
-    if schema.has_title_hash:
-        payload["title_hash"] = title_hash[:DB_HASH_MAX]
-    if schema.has_domain_hash:
-        payload["domain_hash"] = domain_hash[:DB_DOMAIN_HASH_MAX]
+    return _create_lock_record(
+        databases, database_id, collection_id, payload, sdk_mode, log_fn,
+    )
 
-    # v11 state fields
-    if schema.has_status:
-        payload["status"] = STATUS_LOCKED
-    if schema.has_posted:
-        payload["posted"] = False
-    if schema.has_locked_at:
-        payload["locked_at"] = now_iso
-    if schema.has_posted_at:
-        payload["posted_at"] = ""
-    if schema.has_fail_reason:
-        payload["fail_reason"] = ""
 
+def _create_lock_record(
+    databases, database_id, collection_id,
+    payload, sdk_mode, log_fn=print, insert_first=False,
+) -> tuple[bool, str]:
+    """
+    Insert the lock row. Returns (True, doc_id) or (False, reason).
+    On the insert-first path only a unique-index conflict (409 /
+    "already exists") is a lost race; a 400 there is a bad payload
+    and must not trigger the lookup + second insert.
+    """
+    conflict_codes = (409,) if insert_first else (409, 400)
     try:
         doc    = _db_create(databases, database_id, collection_id, payload, sdk_mode)
         doc_id = doc.get("$id") or doc.get("id", "")
@@ -1840,7 +2712,7 @@ def _write_soft_lock(
         return True, doc_id
     except AppwriteException as e:
         msg = str(e.message).lower()
-        if "already exists" in msg or e.code in (409, 400):
+        if "already exists" in msg or e.code in conflict_codes:
             log_fn("[lock] Race condition — another instance won.")
             return False, "race_lost"
         log_fn(f"[lock] DB error: {e.message}")
@@ -1854,7 +2726,7 @@ def _mark_posted(
     databases, database_id, collection_id,
     doc_id, sdk_mode, log_fn=print,
 ) -> bool:
-    now_iso = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000+00:00")
+    now_iso = datetime.now(timezone.utc).strftime(DB_DATETIME_FMT)
     return _update_record(
         databases, database_id, collection_id, doc_id, sdk_mode,
         {"status": STATUS_POSTED, "posted": True, "posted_at": now_iso},
@@ -1938,7 +2810,7 @@ def _make_domain_hash(domain: str) -> str:
     ).hexdigest()[:DB_DOMAIN_HASH_MAX]
 
 def _normalize_tokens(title: str) -> frozenset:
-    title = re.sub(r"[^a-z0-9\s]", " ", title.lower())
+    title = _NON_ALNUM_RE.sub(" ", title.lower())
     return frozenset(
         t for t in title.split()
         if t not in TITLE_STOP_WORDS and len(t) >= 2
@@ -1965,17 +2837,48 @@ def _fuzzy_duplicate(
     return False, None, best
 
 def _get_domain(url: str) -> str:
+    # hostname is lower-cased and free of port/userinfo, unlike netloc
     try:
-        parts = urlparse(url).netloc.replace("www.", "").split(".")
-        return ".".join(parts[-2:]) if len(parts) >= 2 else url[:30]
-    except Exception:
+        host = urlparse(url).hostname or ""
+    except ValueError:
         return url[:30]
+    parts = host.split(".")
+    return ".".join(parts[-2:]) if len(parts) >= 2 else url[:30]
 
 
 # ═══════════════════════════════════════════════════════════
 # SECTION 14 — SCRAPING
 # ═══════════════════════════════════════════════════════════
 
+_HTTP_SESSION: requests.Session | None = None
+
+
+def _http_session() -> requests.Session:
+    """
+    Process-wide requests.Session for article scraping.
+    Pooled connections survive warm runs; retries cover
+    transient 5xx.
+    """
+    global _HTTP_SESSION
+    if _HTTP_SESSION is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(
+                total=1,
+                backoff_factor=0.2,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=("GET",),
+            ),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://",  adapter)
+        session.headers.update({"User-Agent": HTTP_USER_AGENT})
+        _HTTP_SESSION = session
+    return _HTTP_SESSION
+
+
 def _select_content(
     scraped_text: str | None, description: str, title: str,
 ) -> str:
@@ -1986,22 +2889,45 @@ def _select_content(
     return title
 
 
-def _scrape_text(url: str, log_fn=print) -> str | None:
+def _fetch_article(url: str, log_fn=print) -> BeautifulSoup | None:
+    """GET and parse an article page. Logs and returns None on failure."""
     try:
-        resp = requests.get(
+        resp = _http_session().get(
             url,
-            headers={
-                "User-Agent": (
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/120.0.0.0 Safari/537.36"
-                ),
-                "Accept-Language": "en-US,en;q=0.9",
-            },
+            headers={"Accept-Language": "en-US,en;q=0.9"},
             timeout=SCRAPE_TIMEOUT - 3,
         )
         resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "lxml")
+        return BeautifulSoup(resp.text, "lxml")
+    except requests.exceptions.Timeout:
+        log_fn(f"[scrape] Timeout: {url[:60]}")
+        return None
+    except requests.exceptions.HTTPError as e:
+        log_fn(f"[scrape] HTTP {e.response.status_code}: {url[:60]}")
+        return None
+    except Exception as e:
+        log_fn(f"[scrape] Error: {e}")
+        return None
+
+
+def _scrape_article(url: str, rss_entry, log_fn=print) -> tuple[str | None, list]:
+    """
+    Text and images from one fetch + parse of the article page.
+    Images are read first: the text pass strips more tags.
+    """
+    soup   = _fetch_article(url, log_fn)
+    images = _extract_images(soup, rss_entry, log_fn)
+    text   = _extract_text(soup, log_fn) if soup is not None else None
+    return text, images
+
+
+def _scrape_text(url: str, log_fn=print) -> str | None:
+    soup = _fetch_article(url, log_fn)
+    return _extract_text(soup, log_fn) if soup is not None else None
+
+
+def _extract_text(soup: BeautifulSoup, log_fn=print) -> str | None:
+    try:
         for tag in soup([
             "script", "style", "nav", "footer", "header", "aside",
             "form", "iframe", "noscript", "figcaption",
@@ -2010,10 +2936,10 @@ def _scrape_text(url: str, log_fn=print) -> str | None:
             tag.decompose()
         body = (
             soup.find("article")
-            or soup.find("div", {"class": re.compile(r"article[-_]?body",  re.I)})
-            or soup.find("div", {"class": re.compile(r"post[-_]?content",   re.I)})
-            or soup.find("div", {"class": re.compile(r"entry[-_]?content",  re.I)})
-            or soup.find("div", {"class": re.compile(r"story[-_]?body",     re.I)})
+            or soup.find("div", {"class": _ARTICLE_BODY_RE})
+            or soup.find("div", {"class": _POST_CONTENT_RE})
+            or soup.find("div", {"class": _ENTRY_CONTENT_RE})
+            or soup.find("div", {"class": _STORY_BODY_RE})
             or soup.find("main")
         )
         area      = body or soup
@@ -2021,7 +2947,7 @@ def _scrape_text(url: str, log_fn=print) -> str | None:
         lines     = []
         seen_keys: set[str] = set()
         for el in area.find_all(TARGET):
-            raw = re.sub(r"\s+", " ", el.get_text(" ").strip())
+            raw = _WHITESPACE_RE.sub(" ", el.get_text(" ").strip())
             if len(raw) < 25: continue
             key = raw.lower()[:80]
             if key in seen_keys: continue
@@ -2039,18 +2965,14 @@ def _scrape_text(url: str, log_fn=print) -> str | None:
                 lines.append(raw)
         text = "\n".join(lines).strip()
         return text[:MAX_SCRAPED_CHARS] if len(text) >= 100 else None
-    except requests.exceptions.Timeout:
-        log_fn(f"[scrape] Timeout: {url[:60]}")
-        return None
-    except requests.exceptions.HTTPError as e:
-        log_fn(f"[scrape] HTTP {e.response.status_code}: {url[:60]}")
-        return None
     except Exception as e:
         log_fn(f"[scrape] Error: {e}")
         return None
 
 
-def _scrape_images(url: str, rss_entry, log_fn=print) -> list:
+def _extract_images(
+    soup: BeautifulSoup | None, rss_entry, log_fn=print,
+) -> list:
     images: list[str] = []
     seen:   set[str]  = set()
 
@@ -2060,7 +2982,7 @@ def _scrape_images(url: str, rss_entry, log_fn=print) -> list:
         if not img_url.startswith("http") or img_url in seen: return
         lower = img_url.lower()
         if any(b in lower for b in IMAGE_BLOCKLIST): return
-        base     = lower.split("?")[0]
+        base     = lower.partition("?")[0]
         has_ext  = any(base.endswith(e) for e in IMAGE_EXTENSIONS)
         has_word = any(
             w in lower
@@ -2071,43 +2993,33 @@ def _scrape_images(url: str, rss_entry, log_fn=print) -> list:
         images.append(img_url)
 
     try:
-        resp = requests.get(
-            url,
-            headers={"User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            )},
-            timeout=8,
-        )
-        resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "lxml")
-        for tag in soup([
-            "script", "style", "nav", "footer", "header",
-            "aside", "form", "iframe", "noscript", "button",
-        ]):
-            tag.decompose()
-        body = (
-            soup.find("article")
-            or soup.find("div", {"class": re.compile(r"article[-_]?body", re.I)})
-            or soup.find("div", {"class": re.compile(r"post[-_]?content",  re.I)})
-            or soup.find("div", {"class": re.compile(r"entry[-_]?content", re.I)})
-            or soup.find("main")
-        )
-        area = body or soup
-        for img in area.find_all("img"):
-            src = (
-                img.get("data-src") or img.get("data-original")
-                or img.get("data-lazy-src") or img.get("src") or ""
+        if soup is not None:
+            for tag in soup([
+                "script", "style", "nav", "footer", "header",
+                "aside", "form", "iframe", "noscript", "button",
+            ]):
+                tag.decompose()
+            body = (
+                soup.find("article")
+                or soup.find("div", {"class": _ARTICLE_BODY_RE})
+                or soup.find("div", {"class": _POST_CONTENT_RE})
+                or soup.find("div", {"class": _ENTRY_CONTENT_RE})
+                or soup.find("main")
             )
-            _add(src)
-            if len(images) >= MAX_IMAGES: break
-        if len(images) < MAX_IMAGES:
-            for source in area.find_all("source"):
-                srcset = source.get("srcset", "")
-                if srcset:
-                    _add(srcset.split(",")[0].strip().split(" ")[0])
+            area = body or soup
+            for img in area.find_all("img"):
+                src = (
+                    img.get("data-src") or img.get("data-original")
+                    or img.get("data-lazy-src") or img.get("src") or ""
+                )
+                _add(src)
                 if len(images) >= MAX_IMAGES: break
+            if len(images) < MAX_IMAGES:
+                for source in area.find_all("source"):
+                    srcset = source.get("srcset", "")
+                    if srcset:
+                        _add(srcset.partition(",")[0].strip().partition(" ")[0])
+                    if len(images) >= MAX_IMAGES: break
     except Exception as e:
         log_fn(f"[scrape] Image error: {e}")
 
@@ -2120,41 +3032,45 @@ def _scrape_images(url: str, rss_entry, log_fn=print) -> list:
     return images[:MAX_IMAGES]
 
 
+def _first_img_src(html: str) -> str | None:
+    """First <img src> in an HTML fragment, if absolute. Regex, no DOM."""
+    if not html or "<img" not in html.lower():
+        return None
+    m = _IMG_SRC_RE.search(html)
+    if m and m.group(1).startswith("http"):
+        return m.group(1)
+    return None
+
+
 def _extract_rss_image(entry) -> str | None:
+    """
+    First image from the feed entry itself. Each FeedParserDict key
+    is read once; "description" is feedparser's alias of "summary".
+    """
     if entry is None: return None
     try:
-        for m in entry.get("media_content", []):
+        media = entry.get("media_content") or ()
+        for m in media:
             if m.get("url") and m.get("medium") == "image":
                 return m["url"]
-        for m in entry.get("media_content", []):
+        for m in media:
             url = m.get("url", "")
-            if url and any(url.lower().endswith(e) for e in IMAGE_EXTENSIONS):
+            if url and url.lower().endswith(_IMAGE_EXT_TUPLE):
                 return url
-        enc = entry.get("enclosure")
-        if enc:
+        for enc in entry.get("enclosures") or ():
             url = enc.get("href") or enc.get("url", "")
             if url and enc.get("type", "").startswith("image/"):
                 return url
-        thumbs = entry.get("media_thumbnail", [])
+        thumbs = entry.get("media_thumbnail") or ()
         if thumbs and thumbs[0].get("url"):
             return thumbs[0]["url"]
-        for field in ["summary", "description"]:
-            html = entry.get(field, "")
-            if html:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore")
-                    img = BeautifulSoup(html, "html.parser").find("img")
-                if img:
-                    src = img.get("src", "")
-                    if src.startswith("http"): return src
-        if hasattr(entry, "content") and entry.content:
-            html = entry.content[0].get("value", "")
-            if html:
-                img = BeautifulSoup(html, "html.parser").find("img")
-                if img:
-                    src = img.get("src", "")
-                    if src.startswith("http"): return src
-    except Exception:
+        src = _first_img_src(entry.get("summary") or "")
+        if src: return src
+        content = entry.get("content")
+        if content:
+            src = _first_img_src(content[0].get("value", ""))
+            if src: return src
+    except (AttributeError, KeyError, IndexError, TypeError):
         pass
     return None
 
@@ -2163,20 +3079,138 @@ def _extract_rss_image(entry) -> str | None:
 # SECTION 15 — TELEGRAM POSTING
 # ═══════════════════════════════════════════════════════════
 
+# Bot per token, tagged with the event loop its httpx pool was opened
+# on. Pooled connections cannot cross loops, so a new loop gets a new Bot.
+_BOT_CACHE: dict[str, tuple[Bot, asyncio.AbstractEventLoop]] = {}
+
+
+async def _get_bot(token: str) -> Bot:
+    """
+    Warm-start reuse of _make_bot, scoped to the running loop.
+    A Bot left over from another loop has its HTTPXRequest shut down
+    before it is replaced. If that loop is already closed, the close
+    fails part-way: httpx still marks the client closed and drops its
+    connections, and their sockets are freed when collected.
+    """
+    loop   = asyncio.get_running_loop()
+    cached = _BOT_CACHE.get(token)
+    if cached is not None and cached[1] is loop:
+        return cached[0]
+    if cached is not None:
+        # Bot.shutdown() is a no-op for a never-initialized Bot, so
+        # release the request's pool directly.
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(
+                cached[0].request.shutdown(), timeout=TG_POOL_TIMEOUT,
+            )
+    bot = _make_bot(token)
+    _BOT_CACHE[token] = (bot, loop)
+    return bot
+
+
+def _make_bot(token: str) -> Bot:
+    """
+    Bot over a pooled keep-alive httpx client. PTB's default pool
+    holds a single connection with a 1s pool timeout, so the sticker
+    task and any overlapping send would queue behind each other.
+    The default 5s read timeout is also too short for albums: the
+    send times out, the photo fallback fires, and the album may
+    still land — a double post.
+    """
+    request = HTTPXRequest(
+        connection_pool_size=TG_POOL_SIZE,
+        pool_timeout=TG_POOL_TIMEOUT,
+        read_timeout=TG_READ_TIMEOUT,
+    )
+    return Bot(token=token, request=request)
+
+
+async def _download_images(image_urls: list, log_fn=print) -> list:
+    """
+    Prefetch image bytes concurrently so Telegram receives an upload
+    instead of fetching each URL server-side (slow, and a common
+    cause of failed albums). Any image that fails, is not image/*,
+    or exceeds IMAGE_MAX_BYTES keeps its URL as the fallback.
+    Byte-identical images (same file behind different URLs) are
+    uploaded once. Order is preserved.
+    """
+    if not image_urls:
+        return []
+
+    async def _get(session: aiohttp.ClientSession, url: str) -> bytes | str:
+        try:
+            async with session.get(url) as resp:
+                if resp.status != 200:
+                    return url
+                if not resp.headers.get("Content-Type", "").startswith("image/"):
+                    return url
+                if (resp.content_length or 0) > IMAGE_MAX_BYTES:
+                    return url
+                data = await resp.content.read(IMAGE_MAX_BYTES + 1)
+                return data if 0 < len(data) <= IMAGE_MAX_BYTES else url
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return url
+
+    async with aiohttp.ClientSession(
+        headers={"User-Agent": HTTP_USER_AGENT},
+        timeout=aiohttp.ClientTimeout(total=IMAGE_DL_TIMEOUT),
+    ) as session:
+        fetched_media = await asyncio.gather(
+            *(_get(session, u) for u in image_urls)
+        )
+
+    media: list = []
+    digests: set[bytes] = set()
+    for m in fetched_media:
+        if isinstance(m, bytes):
+            digest = hashlib.blake2b(m, digest_size=16).digest()
+            if digest in digests:
+                continue
+            digests.add(digest)
+        media.append(m)
+
+    fetched = sum(1 for m in media if isinstance(m, bytes))
+    log_fn(f"[tg] Prefetched {fetched}/{len(media)} images.")
+    return media
+
+
+async def _tg_send(send, log_fn=print, **kwargs):
+    """
+    Call a Bot send method, waiting out one flood-control RetryAfter
+    of up to TG_RETRY_AFTER_MAX seconds before retrying once.
+    """
+    try:
+        return await send(**kwargs)
+    except RetryAfter as e:
+        if e.retry_after > TG_RETRY_AFTER_MAX:
+            raise
+        log_fn(f"[tg] Flood control — retrying in {e.retry_after}s.")
+        await asyncio.sleep(e.retry_after)
+        return await send(**kwargs)
+
+
 async def _post_to_telegram(
     bot: Bot, chat_id: str, caption: str,
-    image_urls: list, log_fn=print,
+    images: list, log_fn=print,
 ) -> bool:
+    """
+    Album/photo first, then the caption as a reply to it.
+    images holds prefetched bytes or URL strings (both accepted
+    by InputMediaPhoto / send_photo).
+    """
     anchor_msg_id = None
     posted        = False
 
-    if len(image_urls) >= 2:
+    if len(images) >= 2:
         try:
             media_group   = [
-                InputMediaPhoto(media=url)
-                for url in image_urls[:MAX_IMAGES]
+                InputMediaPhoto(media=img)
+                for img in images[:MAX_IMAGES]
             ]
-            sent_msgs     = await bot.send_media_group(
+            sent_msgs     = await _tg_send(
+                bot.send_media_group, log_fn,
                 chat_id=chat_id, media=media_group,
                 disable_notification=True,
             )
@@ -2187,20 +3221,22 @@ async def _post_to_telegram(
             )
         except Exception as e:
             log_fn(f"[tg] ① Album failed: {str(e)[:120]}")
-            if image_urls:
+            if images:
                 try:
-                    sent          = await bot.send_photo(
-                        chat_id=chat_id, photo=image_urls[0],
+                    sent          = await _tg_send(
+                        bot.send_photo, log_fn,
+                        chat_id=chat_id, photo=images[0],
                         disable_notification=True,
                     )
                     anchor_msg_id = sent.message_id
                     log_fn(f"[tg] ① Fallback photo. anchor={anchor_msg_id}")
                 except Exception as e2:
                     log_fn(f"[tg] ① Photo fallback failed: {str(e2)[:80]}")
-    elif len(image_urls) == 1:
+    elif len(images) == 1:
         try:
-            sent          = await bot.send_photo(
-                chat_id=chat_id, photo=image_urls[0],
+            sent          = await _tg_send(
+                bot.send_photo, log_fn,
+                chat_id=chat_id, photo=images[0],
                 disable_notification=True,
             )
             anchor_msg_id = sent.message_id
@@ -2223,7 +3259,7 @@ async def _post_to_telegram(
         }
         if anchor_msg_id is not None:
             kwargs["reply_to_message_id"] = anchor_msg_id
-        await bot.send_message(**kwargs)
+        await _tg_send(bot.send_message, log_fn, **kwargs)
         log_fn(
             f"[tg] ③ Caption sent "
             f"({'reply_to=' + str(anchor_msg_id) if anchor_msg_id else 'standalone'})."
@@ -2233,21 +3269,31 @@ async def _post_to_telegram(
         log_fn(f"[tg] ③ Caption failed: {str(e)[:120]}")
         return False
 
-    if posted and FASHION_STICKERS:
-        await asyncio.sleep(STICKER_DELAY)
-        try:
-            await bot.send_sticker(
-                chat_id=chat_id,
-                sticker=random.choice(FASHION_STICKERS),
-                disable_notification=True,
-            )
-            log_fn("[tg] ④ Sticker sent.")
-        except Exception as e:
-            log_fn(f"[tg] ④ Sticker failed (non-fatal): {str(e)[:80]}")
-
     return posted
 
 
+async def _send_sticker(bot: Bot, chat_id: str, log_fn=print) -> None:
+    """
+    Closing sticker, sent after the caption is confirmed.
+    Kept out of _post_to_telegram so a slow sticker can neither
+    push the post past TELEGRAM_TIMEOUT nor delay the DB update.
+    Never raises.
+    """
+    if not FASHION_STICKERS:
+        return
+    await asyncio.sleep(STICKER_DELAY)
+    try:
+        await _tg_send(
+            bot.send_sticker, log_fn,
+            chat_id=chat_id,
+            sticker=random.choice(FASHION_STICKERS),
+            disable_notification=True,
+        )
+        log_fn("[tg] ④ Sticker sent.")
+    except Exception as e:
+        log_fn(f"[tg] ④ Sticker failed (non-fatal): {str(e)[:80]}")
+
+
 # ═══════════════════════════════════════════════════════════
 # SECTION 16 — SCHEMA MIGRATION UTILITY
 #
@@ -2260,6 +3306,8 @@ def _run_migrate():
     """
     Add v11 schema fields to the Appwrite collection.
     Fields added: status, posted, locked_at, posted_at, fail_reason.
+    Indexes added: link_unique (unique on link), content_hash_key,
+    title_hash_key (dedup lookups).
     Existing fields are not modified.
     """
     print("[migrate] Starting schema migration...")
@@ -2314,6 +3362,45 @@ def _run_migrate():
         except Exception as e:
             print(f"[migrate] ✗ Error adding {field_key}: {e}")
 
+    # Unique index on link: lets the soft lock insert first and
+    # treat a conflict as "already recorded" (one round-trip).
+    # Key indexes on the hash fields: the batched dedup queries
+    # filter on them every run, so without one each is a scan.
+    try:
+        from appwrite.enums.index_type import IndexType
+        unique_type, key_type = IndexType.UNIQUE, IndexType.KEY
+    except ImportError:
+        unique_type, key_type = "unique", "key"
+
+    # (key, type, attributes, hint on failure)
+    INDEXES_TO_ADD = [
+        ("link_unique",      unique_type, ["link"],
+         "Remove duplicate links first (--cleanup)."),
+        ("content_hash_key", key_type,    ["content_hash"],
+         "Field content_hash must exist first."),
+        ("title_hash_key",   key_type,    ["title_hash"],
+         "Field title_hash must exist first."),
+    ]
+
+    for index_key, index_type, attributes, hint in INDEXES_TO_ADD:
+        try:
+            databases.create_index(
+                database_id=db_id,
+                collection_id=col_id,
+                key=index_key,
+                type=index_type,
+                attributes=attributes,
+            )
+            print(f"[migrate] ✓ Added index: {index_key}")
+        except AppwriteException as e:
+            if "already exists" in str(e.message).lower():
+                print(f"[migrate] ℹ Index already exists: {index_key}")
+            else:
+                print(f"[migrate] ✗ Failed to add {index_key}: {e.message}")
+                print(f"[migrate]   {hint}")
+        except Exception as e:
+            print(f"[migrate] ✗ Error adding {index_key}: {e}")
+
     print("[migrate] Done. Wait ~30s for Appwrite to index new fields.")
     print("[migrate] Then run --cleanup to clear unposted records.")
 